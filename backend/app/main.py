@@ -1,7 +1,9 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import notes, users
-from app.db import connect_to_mongo, close_mongo_connection
+from app.routes import notes, users, analytics
+from app.db import db, connect_to_mongo, close_mongo_connection
+from app.services.similar import similar_index
+from app.services.analytics import ensure_rollup_indexes
 import logging
 
 # Logger
@@ -29,6 +31,9 @@ app.add_middleware(
 async def startup_db():
     await connect_to_mongo()
     logger.info("MongoDB connected successfully.")
+    # Build the similar-notes index in the background so startup is not blocked
+    similar_index.start_load(db.notes)
+    await ensure_rollup_indexes()
 
 # Disconnect MongoDB at shutdown
 @app.on_event("shutdown")
@@ -39,6 +44,7 @@ async def shutdown_db():
 # Include API routes
 app.include_router(users.router)
 app.include_router(notes.router)
+app.include_router(analytics.router)
 
 # Root check endpoint
 @app.get("/")
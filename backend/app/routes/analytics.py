@@ -0,0 +1,87 @@
+from fastapi import APIRouter, HTTPException, Depends
+from datetime import datetime, timedelta
+from app.auth import get_current_user
+from app.db import db
+import os
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+# Roles are chosen by the client at registration, so access is granted by
+# a server-side allowlist of emails instead. Emails are stored case-sensitively,
+# so entries must match the registered email exactly.
+ANALYTICS_ADMIN_EMAILS = {
+    email.strip()
+    for email in os.getenv("ANALYTICS_ADMIN_EMAILS", "").split(",")
+    if email.strip()
+}
+MAX_RANGE_DAYS = 366
+
+# ─────────────────────────────────────────────────────────────
+# Helpers
+def require_supervisor(user=Depends(get_current_user)):
+    if user.get("email") not in ANALYTICS_ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Not allowed to view analytics")
+    return user
+
+def parse_day(value: str) -> str:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be in YYYY-MM-DD format")
+
+def day_range(start: str = None, end: str = None) -> tuple:
+    end_day = parse_day(end) if end else datetime.utcnow().strftime("%Y-%m-%d")
+    start_day = parse_day(start) if start else (
+        datetime.strptime(end_day, "%Y-%m-%d") - timedelta(days=29)
+    ).strftime("%Y-%m-%d")
+
+    span = datetime.strptime(end_day, "%Y-%m-%d") - datetime.strptime(start_day, "%Y-%m-%d")
+    if span.days < 0 or span.days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range must be 1 to {MAX_RANGE_DAYS} days")
+    return start_day, end_day
+
+def prescription_rate(doc: dict) -> float:
+    return round(doc.get("prescriptions", 0) / doc["notes"], 4) if doc.get("notes") else 0.0
+
+# ─────────────────────────────────────────────────────────────
+# DAILY TOTALS: notes, critical cases, languages, prescription rate
+@router.get("/daily")
+async def get_daily(start: str = None, end: str = None, user=Depends(require_supervisor)):
+    start_day, end_day = day_range(start, end)
+    docs = await db.rollup_daily.find(
+        {"_id": {"$gte": start_day, "$lte": end_day}}
+    ).sort("_id", 1).to_list(MAX_RANGE_DAYS)
+
+    days = [
+        {
+            "day": doc["_id"],
+            "notes": doc.get("notes", 0),
+            "critical": doc.get("critical", 0),
+            "prescriptions": doc.get("prescriptions", 0),
+            "prescription_rate": prescription_rate(doc),
+            "languages": doc.get("languages", {})
+        }
+        for doc in docs
+    ]
+    return {"start": start_day, "end": end_day, "days": days}
+
+# ─────────────────────────────────────────────────────────────
+# WORKLOAD: notes per worker for one day
+@router.get("/workers")
+async def get_workers(day: str = None, limit: int = 100, user=Depends(require_supervisor)):
+    day = parse_day(day) if day else datetime.utcnow().strftime("%Y-%m-%d")
+    if limit < 1 or limit > 1000:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 1000")
+
+    docs = await db.rollup_workers.find({"day": day}).sort("notes", -1).to_list(limit)
+    workers = [
+        {
+            "user_email": doc["user_email"],
+            "notes": doc.get("notes", 0),
+            "critical": doc.get("critical", 0),
+            "prescriptions": doc.get("prescriptions", 0),
+            "prescription_rate": prescription_rate(doc)
+        }
+        for doc in docs
+    ]
+    return {"day": day, "workers": workers}
@@ -12,20 +12,41 @@ from app.services.ai import (
 )
 from app.auth import get_current_user_optional
 from app.db import db
+from app.services.similar import similar_index, SIMILAR_MIN_SCORE
+from app.services.analytics import record_note, record_prescription
+from bson import ObjectId
 import uuid
 import aiofiles
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/notes", tags=["Notes"])
 
+SIMILAR_CASES_IN_PROMPT = 2
+SIMILAR_CASES_MIN_SCORE = 0.35
+
 # ─────────────────────────────────────────────────────────────
 # TEXT-BASED NOTE GENERATION
 @router.post("/generate")
 async def generate_note(request: TextRequest, user=Depends(get_current_user_optional)):
+    # Similar past cases give the model a consistent reference
+    similar_cases = []
+    if user:
+        try:
+            similar_cases = await find_similar_notes(
+                request.transcription, user, k=SIMILAR_CASES_IN_PROMPT, min_score=SIMILAR_CASES_MIN_SCORE
+            )
+        except Exception as e:
+            logger.error(f"Error finding similar cases: {str(e)}")
+            similar_cases = []
+
     result = await generate_medical_note(
         transcription=request.transcription,
         language=request.language,
-        patient_name=request.patient_name
+        patient_name=request.patient_name,
+        similar_cases=similar_cases
     )
 
     # Save only if user is logged in
@@ -39,7 +60,19 @@ async def generate_note(request: TextRequest, user=Depends(get_current_user_opti
             "is_critical": result["is_critical"],
             "timestamp": datetime.utcnow().isoformat()
         }
-        await db.notes.insert_one(note_doc)
+        inserted = await db.notes.insert_one(note_doc)
+
+        # The note is already saved; sync() on the next search retries indexing it
+        try:
+            await similar_index.add(str(inserted.inserted_id), request.transcription, user["email"])
+        except Exception as e:
+            logger.error(f"Error adding note to similar-notes index: {str(e)}")
+
+        # The note is already saved; a rollup failure is repaired by the rebuild tool
+        try:
+            await record_note(note_doc)
+        except Exception as e:
+            logger.error(f"Error updating rollups for note: {str(e)}")
 
     return result
 
@@ -82,10 +115,21 @@ async def generate_prescription(request: PrescriptionRequest, user=Depends(get_c
             sort=[("timestamp", -1)]
         )
         if last_note:
-            await db.notes.update_one(
-                {"_id": last_note["_id"]},
-                {"$set": {"prescription": prescription_text}}
+            # Only the request that sets the note's first prescription counts it in the rollups
+            first = await db.notes.find_one_and_update(
+                {"_id": last_note["_id"], "prescription": None},
+                {"$set": {"prescription": prescription_text, "prescribed_at": datetime.utcnow()}}
             )
+            if first:
+                try:
+                    await record_prescription(first)
+                except Exception as e:
+                    logger.error(f"Error updating rollups for prescription: {str(e)}")
+            else:
+                await db.notes.update_one(
+                    {"_id": last_note["_id"]},
+                    {"$set": {"prescription": prescription_text}}
+                )
 
     return {"prescription": prescription_text}
 
@@ -99,6 +143,41 @@ async def get_history(user=Depends(get_current_user_optional)):
     notes = await db.notes.find({"user_email": user["email"]}).to_list(50)
     return {"history": notes}
 
+# ─────────────────────────────────────────────────────────────
+# SIMILAR PAST CASES (only own data, like /history)
+async def find_similar_notes(text: str, user: dict, k: int = 5, min_score: float = SIMILAR_MIN_SCORE) -> list:
+    await similar_index.sync(db.notes)
+    matches = await similar_index.search(text, k=k, user_email=user["email"], min_score=min_score)
+    if not matches:
+        return []
+
+    docs = await db.notes.find(
+        {
+            "_id": {"$in": [ObjectId(note_id) for note_id, _ in matches]},
+            "user_email": user["email"]
+        },
+        {"user_email": 0}
+    ).to_list(len(matches))
+    docs_by_id = {str(doc["_id"]): doc for doc in docs}
+
+    similar = []
+    for note_id, score in matches:
+        doc = docs_by_id.get(note_id)
+        if doc:
+            doc["_id"] = note_id
+            doc["score"] = round(score, 4)
+            similar.append(doc)
+    return similar
+
+@router.get("/similar")
+async def get_similar_notes(q: str, k: int = 5, user=Depends(get_current_user_optional)):
+    if not user:
+        raise HTTPException(status_code=401, detail="Authentication required to search notes")
+    if k < 1 or k > 50:
+        raise HTTPException(status_code=400, detail="k must be between 1 and 50")
+
+    return {"similar": await find_similar_notes(q, user, k=k)}
+
 # ─────────────────────────────────────────────────────────────
 # MEDICAL QUESTION ASKING (free-form AI Q&A)
 @router.post("/ask")
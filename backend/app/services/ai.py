@@ -79,9 +79,24 @@ async def check_critical_symptoms(text: str) -> bool:
     ]
     return any(kw.lower() in text.lower() for kw in critical_keywords)
 
+# ─────────────────────────────────────────────────────────────
+# Summarise similar past cases as a short prompt reference
+def format_similar_cases(similar_cases: list) -> str:
+    if not similar_cases:
+        return ""
+
+    lines = ["SIMILAR PAST CASES (for consistency only, do not copy):"]
+    for case in similar_cases:
+        note = case.get("note") if isinstance(case.get("note"), dict) else {}
+        complaint = note.get("chief_complaint") or case.get("transcription", "")[:200]
+        assessment = note.get("assessment", "")
+        lines.append(f"- Complaint: {complaint} | Assessment: {assessment}")
+    return "\n".join(lines) + "\n\n"
+
 # ─────────────────────────────────────────────────────────────
 # Generate structured medical note
-async def generate_note(transcription: str, language: str = "en", patient_name: str = "Patient") -> dict:
+async def generate_note(transcription: str, language: str = "en", patient_name: str = "Patient", similar_cases: list = None) -> dict:
+    reference = format_similar_cases(similar_cases)
     prompt = f"""
 You are an experienced rural healthcare assistant. Based on the following patient description (in {language}), generate a detailed and structured medical note in the same language.
 
@@ -109,7 +124,7 @@ Respond only with a valid JSON object in this format:
   }}
 }}
 
-PATIENT DESCRIPTION:
+{reference}PATIENT DESCRIPTION:
 \"{transcription}\"
 
 Respond only in {language}. Output valid JSON.
@@ -150,9 +165,9 @@ Respond only in {language}. Output valid JSON.
 
 # ─────────────────────────────────────────────────────────────
 # Wrapper: generate note + check for criticality
-async def generate_medical_note(transcription: str, language: str = "en", patient_name: str = "Patient") -> dict:
+async def generate_medical_note(transcription: str, language: str = "en", patient_name: str = "Patient", similar_cases: list = None) -> dict:
     try:
-        note_data = await generate_note(transcription, language, patient_name)
+        note_data = await generate_note(transcription, language, patient_name, similar_cases)
         is_critical = await check_critical_symptoms(transcription)
 
         if "patient_name" not in note_data:
@@ -0,0 +1,192 @@
+import re
+import asyncio
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime
+from bson import ObjectId
+from app.db import db
+
+logger = logging.getLogger(__name__)
+
+# ─────────────────────────────────────────────────────────────
+# Rollup collections
+#   rollup_daily:   one doc per day  → notes, critical, prescriptions, languages.<code>
+#   rollup_workers: one doc per day and worker → notes, critical, prescriptions
+ROLLUP_REBUILD_BATCH = 5000
+ROLLUP_WORKERS_INDEX = [("day", 1), ("notes", -1)]
+ROLLUP_NOTE_FIELDS = {
+    "timestamp": 1, "is_critical": 1, "prescription": 1, "prescribed_at": 1, "language": 1, "user_email": 1
+}
+
+# Languages get their own rollup field; anything else is counted under "other"
+ROLLUP_LANGUAGES = {
+    "en", "hi", "bn", "te", "mr", "ta", "gu", "kn", "ml", "or", "pa", "as", "ur"
+}
+
+def note_day(note: dict) -> str:
+    # Notes store timestamps as ISO strings, so the first 10 chars are YYYY-MM-DD
+    timestamp = note.get("timestamp")
+    if hasattr(timestamp, "isoformat"):
+        timestamp = timestamp.isoformat()
+    return (timestamp or "")[:10] or "unknown"
+
+def language_key(language: str) -> str:
+    # "hi-IN" / "hi_IN" count as "hi"
+    code = re.split(r"[-_]", (language or "").strip().lower(), maxsplit=1)[0]
+    return code if code in ROLLUP_LANGUAGES else "other"
+
+def worker_id(day: str, user_email: str) -> str:
+    return f"{day}|{user_email}"
+
+def prescribed_before(note: dict, when: datetime) -> bool:
+    # Notes prescribed before prescribed_at was recorded count as prescribed long ago
+    if not note.get("prescription"):
+        return False
+    prescribed_at = note.get("prescribed_at")
+    return prescribed_at is None or prescribed_at < when
+
+async def ensure_rollup_indexes():
+    await db.rollup_workers.create_index(ROLLUP_WORKERS_INDEX)
+    # Lets the rebuild find prescriptions added while it was scanning
+    await db.notes.create_index("prescribed_at", sparse=True)
+
+# ─────────────────────────────────────────────────────────────
+# Incremental updates (called on note insert and prescription update)
+async def record_note(note: dict):
+    day = note_day(note)
+    critical = 1 if note.get("is_critical") else 0
+    prescribed = 1 if note.get("prescription") else 0
+
+    await db.rollup_daily.update_one(
+        {"_id": day},
+        {"$inc": {
+            "notes": 1,
+            "critical": critical,
+            "prescriptions": prescribed,
+            f"languages.{language_key(note.get('language'))}": 1
+        }},
+        upsert=True
+    )
+
+    if note.get("user_email"):
+        await db.rollup_workers.update_one(
+            {"_id": worker_id(day, note["user_email"])},
+            {
+                "$set": {"day": day, "user_email": note["user_email"]},
+                "$inc": {"notes": 1, "critical": critical, "prescriptions": prescribed}
+            },
+            upsert=True
+        )
+
+async def record_prescription(note: dict):
+    # Callers pass the note only when this update set its first prescription
+    day = note_day(note)
+    await db.rollup_daily.update_one({"_id": day}, {"$inc": {"prescriptions": 1}}, upsert=True)
+
+    if note.get("user_email"):
+        await db.rollup_workers.update_one(
+            {"_id": worker_id(day, note["user_email"])},
+            {
+                "$set": {"day": day, "user_email": note["user_email"]},
+                "$inc": {"prescriptions": 1}
+            },
+            upsert=True
+        )
+
+# ─────────────────────────────────────────────────────────────
+# Full rebuild from raw notes, reading in batches
+async def rebuild_rollups(batch_size: int = ROLLUP_REBUILD_BATCH) -> dict:
+    daily = defaultdict(lambda: {"notes": 0, "critical": 0, "prescriptions": 0, "languages": Counter()})
+    workers = defaultdict(lambda: {"notes": 0, "critical": 0, "prescriptions": 0})
+
+    # Everything before the cutoff is counted here; later changes are replayed after the swap
+    cutoff_at = datetime.utcnow().replace(microsecond=0)
+    scanned = 0
+    cursor = db.notes.find({"_id": {"$lt": ObjectId.from_datetime(cutoff_at)}}, ROLLUP_NOTE_FIELDS)
+    async for note in cursor.batch_size(batch_size):
+        day = note_day(note)
+        critical = 1 if note.get("is_critical") else 0
+        prescribed = 1 if prescribed_before(note, cutoff_at) else 0
+
+        totals = daily[day]
+        totals["notes"] += 1
+        totals["critical"] += critical
+        totals["prescriptions"] += prescribed
+        totals["languages"][language_key(note.get("language"))] += 1
+
+        if note.get("user_email"):
+            worker = workers[(day, note["user_email"])]
+            worker["notes"] += 1
+            worker["critical"] += critical
+            worker["prescriptions"] += prescribed
+
+        scanned += 1
+
+    daily_docs = [
+        {"_id": day, **totals, "languages": dict(totals["languages"])}
+        for day, totals in daily.items()
+    ]
+    worker_docs = [
+        {"_id": worker_id(day, email), "day": day, "user_email": email, **totals}
+        for (day, email), totals in workers.items()
+    ]
+
+    # Build into staging collections, then swap them in so dashboards never see a partial set
+    staging = {"rollup_daily": daily_docs, "rollup_workers": worker_docs}
+    for name, docs in staging.items():
+        temp = db[f"{name}_rebuild"]
+        await temp.drop()
+        for i in range(0, len(docs), batch_size):
+            await temp.insert_many(docs[i:i + batch_size])
+        if name == "rollup_workers":
+            await temp.create_index(ROLLUP_WORKERS_INDEX)
+
+    # Swap just after a whole second, so the ObjectId boundary below matches the swap
+    await asyncio.sleep(1 - datetime.utcnow().microsecond / 1_000_000)
+    swapped_at = datetime.utcnow().replace(microsecond=0)
+    for name, docs in staging.items():
+        temp = db[f"{name}_rebuild"]
+        if docs:
+            await temp.rename(name, dropTarget=True)
+        else:
+            await temp.drop()
+            await db[name].delete_many({})
+    await ensure_rollup_indexes()
+
+    replayed = await replay_rollups(cutoff_at, swapped_at, batch_size)
+
+    logger.info(
+        f"Rebuilt rollups from {scanned} notes: {len(daily_docs)} days, {len(worker_docs)} worker-days, "
+        f"{replayed} changes replayed."
+    )
+    return {"notes": scanned, "days": len(daily_docs), "worker_days": len(worker_docs), "replayed": replayed}
+
+async def replay_rollups(start: datetime, end: datetime, batch_size: int = ROLLUP_REBUILD_BATCH) -> int:
+    """Re-apply note inserts and first prescriptions made between start and end.
+
+    The incremental hooks wrote these to the collections the swap replaced;
+    anything after end was written to the new collections by the hooks.
+    """
+    start_id, end_id = ObjectId.from_datetime(start), ObjectId.from_datetime(end)
+    replayed = 0
+
+    cursor = db.notes.find({"_id": {"$gte": start_id, "$lt": end_id}}, ROLLUP_NOTE_FIELDS)
+    async for note in cursor.batch_size(batch_size):
+        if not prescribed_before(note, end):
+            note["prescription"] = None
+        await record_note(note)
+        replayed += 1
+
+    cursor = db.notes.find(
+        {"_id": {"$lt": start_id}, "prescribed_at": {"$gte": start, "$lt": end}}, ROLLUP_NOTE_FIELDS
+    )
+    async for note in cursor.batch_size(batch_size):
+        await record_prescription(note)
+        replayed += 1
+
+    return replayed
+
+if __name__ == "__main__":
+    import asyncio
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(rebuild_rollups())
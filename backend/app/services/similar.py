@@ -0,0 +1,261 @@
+import os
+import re
+import time
+import zlib
+import logging
+import asyncio
+import threading
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from bson import ObjectId
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# ─────────────────────────────────────────────────────────────
+# Config
+SIMILAR_INDEX_DIM = int(os.getenv("SIMILAR_INDEX_DIM", "256"))
+SIMILAR_INDEX_LOAD_BATCH = 5000
+SIMILAR_LOAD_RETRIES = 3
+SIMILAR_LOAD_RETRY_DELAY = 30
+SIMILAR_MIN_SCORE = 0.2
+# Notes inserted by other workers are picked up by re-reading this window
+SIMILAR_SYNC_WINDOW = timedelta(seconds=30)
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "but", "of", "to", "in", "on", "at", "for", "with",
+    "from", "by", "is", "are", "was", "were", "be", "been", "has", "have", "had",
+    "he", "she", "it", "they", "his", "her", "their", "this", "that", "there",
+    "patient", "patients", "since", "also", "very", "some", "not", "no",
+    "है", "हैं", "था", "थी", "का", "की", "के", "को", "में", "से", "और", "पर", "भी", "ने",
+}
+
+# ─────────────────────────────────────────────────────────────
+# Text → hashed sublinear term-frequency vector (CPU only, no vocabulary to fit)
+def hash_features(text: str, dim: int = SIMILAR_INDEX_DIM) -> np.ndarray:
+    vec = np.zeros(dim, dtype=np.float32)
+    tokens = [t for t in TOKEN_RE.findall((text or "").lower()) if len(t) > 1 and t not in STOPWORDS]
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    for feature in features:
+        h = zlib.crc32(feature.encode("utf-8"))
+        sign = 1.0 if (h >> 31) & 1 else -1.0
+        vec[h % dim] += sign
+
+    np.copysign(np.log1p(np.abs(vec)), vec, out=vec)
+    return vec
+
+def normalise(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+# ─────────────────────────────────────────────────────────────
+# In-memory TF-IDF index over the notes collection.
+# Rows are IDF-weighted and L2-normalised, so a dot product is cosine similarity.
+# Each worker process holds its own copy and catches up through sync().
+class SimilarNotesIndex:
+    def __init__(self, dim: int = SIMILAR_INDEX_DIM, capacity: int = 1024):
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._load_task = None
+        self._reset(capacity)
+
+    def _reset(self, capacity: int):
+        self._vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        self._doc_freq = np.zeros(self.dim, dtype=np.int64)
+        self._note_ids = []
+        self._owner_ids = {}
+        self._owner_rows = {}
+        self._recent = {}
+        self._recent_kept = 0
+        # sync() re-reads notes from this time (minus the window) onwards
+        self._sync_from = None
+        self.size = 0
+        # Until the initial load finishes, rows hold raw term frequencies
+        self.ready = False
+        self.failed = False
+
+    def _owner_id(self, user_email: str) -> int:
+        return self._owner_ids.setdefault(user_email, len(self._owner_ids))
+
+    def _idf(self) -> np.ndarray:
+        return (np.log((1 + self.size) / (1 + self._doc_freq)) + 1).astype(np.float32)
+
+    def _grow(self, needed: int):
+        capacity = self._vectors.shape[0]
+        if needed <= capacity:
+            return
+        # Capacity is preallocated at load, so later inserts only need modest headroom
+        capacity = max(needed, capacity + max(capacity // 8, 1024))
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        vectors[:self.size] = self._vectors[:self.size]
+        self._vectors = vectors
+
+    def _remember(self, note_id: str) -> bool:
+        """Track ids sync() may see again so load/sync never index a note twice."""
+        if note_id in self._recent:
+            return False
+        created = ObjectId(note_id).generation_time if ObjectId.is_valid(note_id) else None
+        if created is None:
+            return True
+
+        cutoff = self._sync_from - SIMILAR_SYNC_WINDOW if self._sync_from is not None else None
+        if cutoff is None or created >= cutoff:
+            self._recent[note_id] = created
+            # Prune once the map doubles, so the cost stays amortised O(1) per add
+            if cutoff is not None and len(self._recent) > max(1000, 2 * self._recent_kept):
+                self._recent = {k: v for k, v in self._recent.items() if v >= cutoff}
+                self._recent_kept = len(self._recent)
+        return True
+
+    def add_many(self, notes: list):
+        """Add (note_id, text, user_email) tuples. Blocking; call from a thread."""
+        rows = [(note_id, hash_features(text, self.dim), user_email) for note_id, text, user_email in notes]
+
+        with self._lock:
+            for note_id, vec, user_email in rows:
+                if not self._remember(note_id):
+                    continue
+                self._grow(self.size + 1)
+                self._doc_freq += vec != 0
+                self.size += 1
+                if self.ready:
+                    vec = normalise(vec * self._idf())
+                self._vectors[self.size - 1] = vec
+                self._owner_rows.setdefault(self._owner_id(user_email), []).append(self.size - 1)
+                self._note_ids.append(note_id)
+
+    def search_sync(self, text: str, k: int = 5, user_email: str = None, min_score: float = SIMILAR_MIN_SCORE) -> list:
+        """Return up to k (note_id, score) pairs scoring at least min_score. Blocking; call from a thread."""
+        with self._lock:
+            if not self.ready or self.size == 0 or k <= 0:
+                return []
+            vectors, note_ids, size = self._vectors, self._note_ids, self.size
+            query = normalise(hash_features(text, self.dim) * self._idf())
+            rows = None
+            if user_email is not None:
+                owner = self._owner_ids.get(user_email)
+                if owner is None:
+                    return []
+                rows = np.array(self._owner_rows[owner])
+
+        # Rows below the snapshot size are never rewritten, so scoring can run unlocked.
+        # Only the caller's own rows are scored, so cost scales with their note count.
+        scores = vectors[:size] @ query if rows is None else vectors[rows] @ query
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        picked = top if rows is None else rows[top]
+        return [(note_ids[r], float(scores[i])) for i, r in zip(top, picked) if scores[i] >= min_score]
+
+    async def add(self, note_id: str, text: str, user_email: str = None):
+        await run_in_threadpool(self.add_many, [(note_id, text, user_email)])
+
+    async def search(self, text: str, k: int = 5, user_email: str = None, min_score: float = SIMILAR_MIN_SCORE) -> list:
+        return await run_in_threadpool(self.search_sync, text, k, user_email, min_score)
+
+    def _finish_load(self):
+        with self._lock:
+            self._vectors[:self.size] *= self._idf()
+            normalise(self._vectors[:self.size])
+            self.ready = True
+
+    async def _add_from_cursor(self, cursor) -> int:
+        batch, added = [], 0
+        async for doc in cursor.batch_size(SIMILAR_INDEX_LOAD_BATCH):
+            batch.append((str(doc["_id"]), doc.get("transcription", ""), doc.get("user_email")))
+            if len(batch) >= SIMILAR_INDEX_LOAD_BATCH:
+                await run_in_threadpool(self.add_many, batch)
+                added, batch = added + len(batch), []
+        if batch:
+            await run_in_threadpool(self.add_many, batch)
+        return added + len(batch)
+
+    async def load(self, collection):
+        """Build the index from every stored note, reading in batches."""
+        started = datetime.now(timezone.utc)
+        count = await collection.estimated_document_count()
+        with self._lock:
+            # Preallocate for the whole collection so loading never copies the matrix
+            self._reset(max(int(count * 1.05), 1024))
+            self._sync_from = started
+
+        await self._add_from_cursor(
+            collection.find({}, {"transcription": 1, "user_email": 1}).sort("_id", 1)
+        )
+        await run_in_threadpool(self._finish_load)
+        logger.info(f"Similar-notes index loaded with {self.size} notes.")
+
+    def start_load(self, collection, retries: int = SIMILAR_LOAD_RETRIES):
+        """Load in a background task, retrying on failure so the index cannot stay silently empty."""
+        self._load_task = asyncio.create_task(self.load(collection))
+        self._load_task.add_done_callback(lambda task: self._load_done(task, collection, retries))
+        return self._load_task
+
+    def _load_done(self, task, collection, retries: int):
+        if task.cancelled() or task.exception() is None:
+            return
+
+        logger.error(f"Failed to load similar-notes index: {task.exception()!r}")
+        with self._lock:
+            self._reset(1024)
+        if retries > 0:
+            logger.info(f"Retrying similar-notes index load in {SIMILAR_LOAD_RETRY_DELAY}s ({retries} left).")
+            asyncio.get_running_loop().call_later(
+                SIMILAR_LOAD_RETRY_DELAY, self.start_load, collection, retries - 1
+            )
+        else:
+            self.failed = True
+            logger.error("Giving up on the similar-notes index; similar-case search is disabled.")
+
+    async def sync(self, collection):
+        """Pick up notes inserted by other worker processes since the last sync."""
+        if not self.ready:
+            return
+        synced_at = datetime.now(timezone.utc)
+        since = ObjectId.from_datetime(self._sync_from - SIMILAR_SYNC_WINDOW)
+        await self._add_from_cursor(
+            collection.find({"_id": {"$gte": since}}, {"transcription": 1, "user_email": 1}).sort("_id", 1)
+        )
+        with self._lock:
+            # Concurrent syncs may finish out of order; never move the sync point backwards
+            if self.ready and self._sync_from is not None:
+                self._sync_from = max(self._sync_from, synced_at)
+
+similar_index = SimilarNotesIndex()
+
+# ─────────────────────────────────────────────────────────────
+# Query latency benchmark on synthetic notes (for debugging)
+def benchmark(n_notes: int = 1_000_000, notes_per_worker: int = 5000, n_queries: int = 50, k: int = 5):
+    rng = np.random.default_rng(0)
+    index = SimilarNotesIndex(capacity=n_notes)
+
+    # Fill the matrix directly; embedding 1M synthetic strings would dominate the run
+    for start in range(0, n_notes, SIMILAR_INDEX_LOAD_BATCH):
+        block = index._vectors[start:start + SIMILAR_INDEX_LOAD_BATCH]
+        block[:] = rng.standard_normal(block.shape, dtype=np.float32)
+        normalise(block)
+    index._note_ids = [str(i) for i in range(n_notes)]
+    for start in range(0, n_notes, notes_per_worker):
+        owner = index._owner_id(f"worker{start // notes_per_worker}@example.com")
+        index._owner_rows[owner] = list(range(start, min(start + notes_per_worker, n_notes)))
+    index.size = n_notes
+    index.ready = True
+
+    queries = ["fever and cough for three days", "chest pain with difficulty breathing"]
+    timings = {}
+    for scope, user_email in (("all notes", None), ("one worker", "worker0@example.com")):
+        start = time.perf_counter()
+        for i in range(n_queries):
+            index.search_sync(queries[i % len(queries)], k=k, user_email=user_email, min_score=-1.0)
+        timings[scope] = (time.perf_counter() - start) * 1000 / n_queries
+        logger.info(f"{n_notes} notes, dim {index.dim}, {scope}: {timings[scope]:.2f} ms per top-{k} query")
+    return timings
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    benchmark()